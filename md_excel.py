@@ -7,11 +7,121 @@ import pandas as pd
 import os
 import re
 import argparse
+import codecs
+import csv
+import importlib.util
+from functools import lru_cache
+from itertools import chain, groupby
 from pathlib import Path
 
+# 编码检测库（可选），优先使用C实现的cchardet，其次charset_normalizer
+try:
+    import cchardet as chardet
+except ImportError:
+    try:
+        import charset_normalizer as chardet
+    except ImportError:
+        chardet = None
+
+# 写入Excel使用的openpyxl（可选，仅转换到Excel时需要）
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+# 大数据量写入Excel时使用的XlsxWriter（可选）
+try:
+    import xlsxwriter
+except ImportError:
+    xlsxwriter = None
+
+def _pandas_version_at_least(major, minor):
+    """
+    判断已安装的pandas版本是否不低于major.minor
+    """
+    match = re.match(r'(\d+)\.(\d+)', pd.__version__)
+    return match is not None and (int(match.group(1)), int(match.group(2))) >= (major, minor)
+
+# 读取Excel时优先使用Rust实现的calamine引擎（可选，需要pandas 2.2及以上），否则由pandas自动选择
+if importlib.util.find_spec('python_calamine') is not None and _pandas_version_at_least(2, 2):
+    _EXCEL_READ_ENGINE = 'calamine'
+else:
+    _EXCEL_READ_ENGINE = None
+
+# 读取CSV时优先使用pyarrow的多线程解析器（可选，需要pandas 2.0及以上）
+_CSV_USE_PYARROW = (
+    importlib.util.find_spec('pyarrow') is not None and _pandas_version_at_least(2, 0)
+)
+
+# pandas read_csv默认视为缺失值的字符串，pyarrow读取时使用同一组
+_CSV_NA_VALUES = [
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan',
+    '1.#IND', '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None',
+    'n/a', 'nan', 'null',
+]
+
+# 表格解析用的预编译正则
+_SEPARATOR_RE = re.compile(r'^\|[\s:-]+\|[\s:-]+\|')
+_TABLE_ROW_RE = re.compile(r'^\s*\|')
+
+def _is_table_row(line):
+    """
+    判断是否是表格行（以 | 字符开头）
+    """
+    return _TABLE_ROW_RE.match(line) is not None
+
+def _sample_decodes(raw_data, encoding, final):
+    """
+    判断样本能否按指定编码严格解码
+    final为False时允许样本末尾存在被截断的多字节字符
+    """
+    try:
+        codecs.getincrementaldecoder(encoding)(errors='strict').decode(raw_data, final=final)
+        return True
+    except (UnicodeDecodeError, LookupError):
+        return False
+
+@lru_cache(maxsize=256)
+def _detect_encoding_cached(path, mtime_ns, size, sample_size, bom_encodings, encodings):
+    """
+    检测文件编码，mtime_ns和size仅作为缓存键使用
+    """
+    with open(path, 'rb') as f:
+        # 先检查BOM，带BOM的文件只需读取前4个字节
+        head = f.read(4)
+        for bom, encoding in bom_encodings:
+            if head.startswith(bom):
+                return encoding
+        raw_data = head + f.read(sample_size - len(head))
+    # 样本未读到文件末尾时，末尾可能截断了多字节字符
+    at_eof = len(raw_data) < sample_size
+    
+    # 纯ASCII样本直接按UTF-8处理（ASCII是UTF-8的子集）
+    if raw_data.isascii():
+        return 'utf-8'
+    
+    # 严格UTF-8解码开销很小，先于编码检测库尝试
+    if _sample_decodes(raw_data, 'utf-8', at_eof):
+        return 'utf-8'
+    
+    # 其次使用编码检测库
+    if chardet is not None:
+        result = chardet.detect(raw_data)
+        # 检测结果须能实际解码样本，否则继续尝试候选编码
+        if (result['encoding'] and (result['confidence'] or 0) > 0.7
+                and _sample_decodes(raw_data, result['encoding'], at_eof)):
+            return result['encoding']
+    
+    # 在已读取的样本上逐个尝试候选编码
+    for encoding in encodings:
+        if _sample_decodes(raw_data, encoding, at_eof):
+            return encoding
+    
+    return 'utf-8'  # 默认编码
+
 class MarkdownExcelConverter:
     # 支持的编码列表
-    SUPPORTED_ENCODINGS = [
+    SUPPORTED_ENCODINGS = (
         'utf-8', 'utf-8-sig',
         'gbk', 'gb2312', 'gb18030',  # 中文编码
         'big5',  # 繁体中文
@@ -20,42 +130,41 @@ class MarkdownExcelConverter:
         'latin-1', 'iso-8859-1',
         'cp1251', 'cp1252', 'koi8-r',  # 欧洲语言
         'ascii'
-    ]
+    )
+    
+    # BOM标记与对应编码（UTF-32需在UTF-16之前检查）
+    BOM_ENCODINGS = (
+        (b'\x00\x00\xfe\xff', 'utf-32'),
+        (b'\xff\xfe\x00\x00', 'utf-32'),
+        (b'\xef\xbb\xbf', 'utf-8-sig'),
+        (b'\xff\xfe', 'utf-16'),
+        (b'\xfe\xff', 'utf-16'),
+    )
+    
+    # 单元格总数超过该值时使用XlsxWriter写入Excel
+    XLSXWRITER_MIN_CELLS = 50_000
+    
+    # 写入Markdown文件时使用的缓冲区大小
+    WRITE_BUFFER_SIZE = 1 << 20
+    
+    # CSV分隔符识别：样本大小与候选分隔符
+    CSV_SNIFF_SIZE = 64 * 1024
+    CSV_DELIMITERS = ',;\t|'
     
     def __init__(self):
         pass
     
-    def detect_encoding(self, file_path, sample_size=1024):
+    def detect_encoding(self, file_path, sample_size=64 * 1024):
         """
         自动检测文件编码
+        结果按 (路径, 修改时间, 大小) 缓存，文件未变化时不再重复读取
         """
-        encodings_to_try = self.SUPPORTED_ENCODINGS.copy()
-        
-        for encoding in encodings_to_try:
-            try:
-                with open(file_path, 'rb') as f:
-                    raw_data = f.read(sample_size)
-                    # 尝试解码
-                    raw_data.decode(encoding, errors='strict')
-                    # 如果成功，尝试读取整个文件的一小部分验证
-                    with open(file_path, 'r', encoding=encoding) as test_file:
-                        test_file.read(100)
-                    return encoding
-            except (UnicodeDecodeError, LookupError):
-                continue
-        
-        # 如果都不行，使用chardet（如果可用）或返回utf-8
-        try:
-            import chardet
-            with open(file_path, 'rb') as f:
-                raw_data = f.read(sample_size * 4)
-                result = chardet.detect(raw_data)
-                if result['confidence'] > 0.7:
-                    return result['encoding']
-        except ImportError:
-            pass
-        
-        return 'utf-8'  # 默认编码
+        path = os.path.abspath(file_path)
+        stat = os.stat(path)
+        return _detect_encoding_cached(
+            path, stat.st_mtime_ns, stat.st_size, sample_size,
+            self.BOM_ENCODINGS, self.SUPPORTED_ENCODINGS,
+        )
     
     def md_to_excel(self, md_file, excel_file=None, sheet_name='Sheet1'):
         """
@@ -70,100 +179,108 @@ class MarkdownExcelConverter:
         print(f"检测到编码: {encoding}")
         
         try:
+            # 逐行读取并提取Markdown表格，避免整个文件读入内存
             with open(md_file, 'r', encoding=encoding) as f:
-                content = f.read()
+                tables = self._extract_markdown_tables(f)
         except Exception as e:
             print(f"读取文件时出错: {e}")
             return False
         
-        # 提取Markdown表格
-        tables = self._extract_markdown_tables(content)
-        
         if not tables:
             print("未找到Markdown表格")
             return False
         
-        # 写入Excel
-        with pd.ExcelWriter(excel_file, engine='openpyxl') as writer:
-            for i, table in enumerate(tables):
-                sheet_name_i = f"{sheet_name}_{i+1}" if i > 0 else sheet_name
-                table.to_excel(writer, sheet_name=sheet_name_i, index=False)
+        if openpyxl is None and xlsxwriter is None:
+            print("写入Excel需要安装openpyxl或XlsxWriter")
+            return False
+        
+        # 写入Excel，数据量较大或openpyxl不可用时使用XlsxWriter
+        sheets = [
+            (f"{sheet_name}_{i+1}" if i > 0 else sheet_name, table)
+            for i, table in enumerate(tables)
+        ]
+        total_cells = sum(table.size for table in tables)
+        if xlsxwriter is not None and (openpyxl is None or total_cells > self.XLSXWRITER_MIN_CELLS):
+            self._write_excel_xlsxwriter(sheets, excel_file)
+        else:
+            self._write_excel_openpyxl(sheets, excel_file)
         
         print(f"转换完成！已保存到: {excel_file}")
         return True
     
-    def _extract_markdown_tables(self, content):
+    def _write_excel_openpyxl(self, sheets, excel_file):
+        """
+        使用openpyxl只写模式写入Excel，逐行写出，不在内存中保留单元格对象
+        """
+        wb = openpyxl.Workbook(write_only=True)
+        for sheet_name, table in sheets:
+            ws = wb.create_sheet(sheet_name)
+            ws.append(tuple(table.columns))
+            for row in table.itertuples(index=False, name=None):
+                ws.append(row)
+        wb.save(excel_file)
+    
+    def _write_excel_xlsxwriter(self, sheets, excel_file):
+        """
+        使用XlsxWriter的constant_memory模式写入Excel，逐行刷新到磁盘
+        """
+        wb = xlsxwriter.Workbook(str(excel_file), {
+            'constant_memory': True,
+            'strings_to_urls': False,
+        })
+        for sheet_name, table in sheets:
+            ws = wb.add_worksheet(sheet_name)
+            ws.write_row(0, 0, tuple(table.columns))
+            for i, row in enumerate(table.itertuples(index=False, name=None), 1):
+                ws.write_row(i, 0, row)
+        wb.close()
+    
+    def _extract_markdown_tables(self, lines):
         """
         从Markdown内容中提取表格
+        lines: 可逐行迭代的对象（如打开的文件）
         """
         tables = []
         
-        # 使用正则表达式匹配Markdown表格
+        # 逐行匹配Markdown表格，连续的表格行构成一个表格
         # 格式: | Header1 | Header2 |
         #       |---------|---------|
         #       | Cell1   | Cell2   |
-        table_pattern = r'(\|.*\|[ \t]*\n)((?:\|.*\|[ \t]*\n)*)'
-        
-        # 改进的正则表达式，匹配完整的表格
-        lines = content.split('\n')
-        table_lines = []
-        in_table = False
-        current_table = []
-        
-        for line in lines:
-            line = line.rstrip()
-            # 检查是否是表格行（包含 | 字符）
-            if '|' in line and line.strip().startswith('|'):
-                if not in_table:
-                    in_table = True
-                current_table.append(line)
-            else:
-                if in_table and current_table:
-                    # 处理当前表格
-                    table_df = self._parse_table_lines(current_table)
-                    if table_df is not None:
-                        tables.append(table_df)
-                    current_table = []
-                    in_table = False
-        
-        # 处理最后一个表格
-        if in_table and current_table:
-            table_df = self._parse_table_lines(current_table)
-            if table_df is not None:
-                tables.append(table_df)
+        for is_table, group in groupby(lines, key=_is_table_row):
+            if is_table:
+                table_df = self._parse_table_lines(group)
+                if table_df is not None:
+                    tables.append(table_df)
         
         return tables
     
     def _parse_table_lines(self, lines):
         """
         解析表格行并转换为DataFrame
+        lines: 表格行的迭代器，逐行消费，不保留原始行
         """
-        if len(lines) < 2:
+        header_line = next(lines, None)
+        second_line = next(lines, None)
+        if second_line is None:
             return None
         
         # 处理表头
-        header_line = lines[0]
         headers = [cell.strip() for cell in header_line.split('|')[1:-1]]
+        if not headers:
+            return None
         
         # 检查是否有分隔行（第二行应该是分隔行）
-        separator_line = lines[1]
-        if re.match(r'^\|[\s:-]+\|[\s:-]+\|', separator_line):
-            data_lines = lines[2:]
-        else:
-            data_lines = lines[1:]
+        if not _SEPARATOR_RE.match(second_line):
+            lines = chain([second_line], lines)
         
-        # 解析数据行
-        data = []
-        for line in data_lines:
-            if line.strip() and '|' in line:
+        # 解析数据行：只保留列数与表头一致的行
+        def iter_rows():
+            for line in lines:
                 cells = [cell.strip() for cell in line.split('|')[1:-1]]
                 if len(cells) == len(headers):
-                    data.append(cells)
+                    yield cells
         
-        if not headers:
-            return None
-        
-        return pd.DataFrame(data, columns=headers)
+        return pd.DataFrame.from_records(iter_rows(), columns=headers)
     
     def excel_to_md(self, excel_file, md_file=None, sheet_name=None):
         """
@@ -176,58 +293,46 @@ class MarkdownExcelConverter:
         try:
             # 读取Excel文件
             if sheet_name:
-                df = pd.read_excel(excel_file, sheet_name=sheet_name)
+                df = pd.read_excel(excel_file, sheet_name=sheet_name, engine=_EXCEL_READ_ENGINE)
                 tables = [(sheet_name, df)]
             else:
-                # 读取所有工作表
-                xls = pd.ExcelFile(excel_file)
-                tables = []
-                for sheet in xls.sheet_names:
-                    df = pd.read_excel(excel_file, sheet_name=sheet)
-                    tables.append((sheet, df))
+                # 一次性读取所有工作表
+                sheets_dict = pd.read_excel(excel_file, sheet_name=None, engine=_EXCEL_READ_ENGINE)
+                tables = list(sheets_dict.items())
         except Exception as e:
             print(f"读取Excel文件时出错: {e}")
             return False
         
-        # 转换为Markdown
-        md_content = ""
-        
-        for sheet_name, df in tables:
-            if len(tables) > 1:
-                md_content += f"## {sheet_name}\n\n"
-            
-            # 将NaN替换为空字符串
-            df = df.fillna('')
-            
-            # 生成Markdown表格
-            if not df.empty:
-                # 表头
-                headers = df.columns.tolist()
-                md_content += "| " + " | ".join(str(h) for h in headers) + " |\n"
-                
-                # 分隔线
-                md_content += "| " + " | ".join(["---"] * len(headers)) + " |\n"
-                
-                # 数据行
-                for _, row in df.iterrows():
-                    row_data = [str(cell) if pd.notna(cell) else "" for cell in row]
-                    md_content += "| " + " | ".join(row_data) + " |\n"
-            
-            md_content += "\n"
-        
-        # 以UTF-8编码写入文件
+        # 转换为Markdown，按工作表逐段以UTF-8编码写入文件
         try:
-            with open(md_file, 'w', encoding='utf-8') as f:
-                f.write(md_content)
+            with open(md_file, 'w', encoding='utf-8', buffering=self.WRITE_BUFFER_SIZE) as f:
+                for sheet_name, df in tables:
+                    if len(tables) > 1:
+                        f.write(f"## {sheet_name}\n\n")
+                    
+                    # 生成Markdown表格
+                    if not df.empty:
+                        # 表头
+                        headers = df.columns.tolist()
+                        f.write("| " + " | ".join(map(str, headers)) + " |\n")
+                        
+                        # 分隔线
+                        f.write("| " + " | ".join(["---"] * len(headers)) + " |\n")
+                        
+                        # 数据行
+                        f.writelines(self._dataframe_to_md_rows(df))
+                    
+                    f.write("\n")
             print(f"转换完成！已保存到: {md_file}")
             return True
         except Exception as e:
             print(f"写入文件时出错: {e}")
             return False
     
-    def convert_csv_to_md(self, csv_file, md_file=None, delimiter=','):
+    def convert_csv_to_md(self, csv_file, md_file=None, delimiter=None):
         """
         将CSV文件转换为Markdown表格
+        未指定分隔符时根据文件开头的样本自动识别
         """
         if md_file is None:
             md_file = Path(csv_file).with_suffix('.md')
@@ -237,24 +342,68 @@ class MarkdownExcelConverter:
         print(f"检测到编码: {encoding}")
         
         try:
-            # 尝试读取CSV
-            df = pd.read_csv(csv_file, encoding=encoding, delimiter=delimiter)
+            if delimiter is None:
+                delimiter = self._sniff_csv_delimiter(csv_file, encoding)
+                print(f"使用分隔符: {repr(delimiter)}")
+            df = None
+            # pyarrow只支持单字符分隔符
+            if _CSV_USE_PYARROW and len(delimiter) == 1:
+                try:
+                    df = self._read_csv_pyarrow(csv_file, encoding, delimiter)
+                except (ValueError, TypeError, NotImplementedError):
+                    # pyarrow无法解析的文件或不支持的选项（如行的字段数不一致）交给C引擎处理
+                    df = None
+            if df is None:
+                # 与pyarrow一致按文本读取，单元格内容不被重新格式化
+                df = pd.read_csv(csv_file, encoding=encoding, delimiter=delimiter, dtype=str)
         except Exception as e:
             print(f"读取CSV文件时出错: {e}")
-            # 尝试其他常见的分隔符
-            for sep in [';', '\t', '|']:
-                try:
-                    df = pd.read_csv(csv_file, encoding=encoding, delimiter=sep)
-                    print(f"使用分隔符: {repr(sep)}")
-                    break
-                except:
-                    continue
-            else:
-                return False
+            return False
         
         # 转换为Markdown
         return self._dataframe_to_md(df, md_file)
     
+    def _read_csv_pyarrow(self, csv_file, encoding, delimiter):
+        """
+        使用pyarrow读取CSV，所有列按文本读取，保持单元格内容不被重新格式化
+        """
+        import pyarrow as pa
+        import pyarrow.csv as pa_csv
+        
+        # C引擎读取表头：原始表头文本用于指定列类型，处理后的列名（重名、空列名）用于结果
+        columns = pd.read_csv(csv_file, encoding=encoding, delimiter=delimiter, nrows=0).columns
+        header = pd.read_csv(csv_file, encoding=encoding, delimiter=delimiter, header=None,
+                             nrows=1, dtype=str, keep_default_na=False)
+        raw_names = header.iloc[0].tolist()
+        
+        # 表头行由pyarrow自行解析，兼容空行和带换行的表头
+        table = pa_csv.read_csv(
+            csv_file,
+            read_options=pa_csv.ReadOptions(encoding=encoding),
+            parse_options=pa_csv.ParseOptions(delimiter=delimiter),
+            convert_options=pa_csv.ConvertOptions(
+                column_types={name: pa.string() for name in raw_names},
+                null_values=_CSV_NA_VALUES,
+                strings_can_be_null=True,
+            ),
+        )
+        if table.column_names != raw_names or len(raw_names) != len(columns):
+            raise ValueError("pyarrow解析的表头与C引擎不一致")
+        df = table.to_pandas(types_mapper=pd.ArrowDtype)
+        df.columns = columns
+        return df
+    
+    def _sniff_csv_delimiter(self, csv_file, encoding):
+        """
+        读取CSV文件开头的一小段样本识别分隔符，识别失败时返回逗号
+        """
+        with open(csv_file, 'r', encoding=encoding, newline='') as f:
+            sample = f.read(self.CSV_SNIFF_SIZE)
+        try:
+            return csv.Sniffer().sniff(sample, delimiters=self.CSV_DELIMITERS).delimiter
+        except csv.Error:
+            return ','
+    
     def _dataframe_to_md(self, df, md_file):
         """
         将DataFrame转换为Markdown并保存
@@ -263,28 +412,33 @@ class MarkdownExcelConverter:
             print("数据框为空")
             return False
         
-        # 将NaN替换为空字符串
-        df = df.fillna('')
-        
-        # 生成Markdown表格
-        md_content = ""
-        headers = df.columns.tolist()
-        md_content += "| " + " | ".join(str(h) for h in headers) + " |\n"
-        md_content += "| " + " | ".join(["---"] * len(headers)) + " |\n"
-        
-        for _, row in df.iterrows():
-            row_data = [str(cell) if pd.notna(cell) else "" for cell in row]
-            md_content += "| " + " | ".join(row_data) + " |\n"
-        
-        # 以UTF-8编码写入文件
+        # 生成Markdown表格并以UTF-8编码写入文件
         try:
-            with open(md_file, 'w', encoding='utf-8') as f:
-                f.write(md_content)
+            with open(md_file, 'w', encoding='utf-8', buffering=self.WRITE_BUFFER_SIZE) as f:
+                headers = df.columns.tolist()
+                f.write("| " + " | ".join(map(str, headers)) + " |\n")
+                f.write("| " + " | ".join(["---"] * len(headers)) + " |\n")
+                f.writelines(self._dataframe_to_md_rows(df))
             print(f"转换完成！已保存到: {md_file}")
             return True
         except Exception as e:
             print(f"写入文件时出错: {e}")
             return False
+    
+    def _dataframe_to_md_rows(self, df):
+        """
+        将DataFrame的数据部分格式化为Markdown表格行（按需逐行生成）
+        """
+        # 按列整体转换为字符串，再将缺失值替换为空字符串，避免逐个单元格调用str
+        text = df.astype(str)
+        # 日期时间列保持str(Timestamp)的格式（astype(str)会省略零点时间）
+        for i, dtype in enumerate(df.dtypes):
+            if pd.api.types.is_datetime64_any_dtype(dtype):
+                text.isetitem(i, df.iloc[:, i].astype(object).map(str))
+        text = text.mask(df.isna(), '')
+        values = text.to_numpy(dtype=object, copy=False)
+        sep = " | "
+        return ("| " + sep.join(row) + " |\n" for row in values)
 
 def main():
     parser = argparse.ArgumentParser(description='Markdown与Excel相互转换工具')
@@ -0,0 +1,53 @@
+import pytest
+
+import md_excel
+from md_excel import MarkdownExcelConverter
+
+
+@pytest.fixture(params=[True, False], ids=['pyarrow', 'c'])
+def converter(request, monkeypatch):
+    if request.param and not md_excel._CSV_USE_PYARROW:
+        pytest.skip("pyarrow不可用")
+    monkeypatch.setattr(md_excel, '_CSV_USE_PYARROW', request.param)
+    return MarkdownExcelConverter()
+
+
+def _csv_to_md(converter, tmp_path, content, delimiter=','):
+    csv_file = tmp_path / 'data.csv'
+    csv_file.write_bytes(content.encode('utf-8'))
+    md_file = tmp_path / 'data.md'
+    assert converter.convert_csv_to_md(csv_file, md_file, delimiter=delimiter)
+    return md_file.read_text(encoding='utf-8')
+
+
+def test_csv_header_after_blank_lines(converter, tmp_path):
+    md = _csv_to_md(converter, tmp_path, '\n\na,b\n1,2\n')
+    assert md == '| a | b |\n| --- | --- |\n| 1 | 2 |\n'
+
+
+def test_csv_quoted_header_with_newline(converter, tmp_path):
+    md = _csv_to_md(converter, tmp_path, '"a\nb",c\n1,2\n')
+    assert md == '| a\nb | c |\n| --- | --- |\n| 1 | 2 |\n'
+
+
+def test_csv_cells_kept_as_text(converter, tmp_path):
+    md = _csv_to_md(converter, tmp_path, 'a,b,c\n001,1.50,NA\n002,1e3,None\n')
+    assert md == '| a | b | c |\n| --- | --- | --- |\n| 001 | 1.50 |  |\n| 002 | 1e3 |  |\n'
+
+
+def test_csv_short_row_filled(converter, tmp_path):
+    md = _csv_to_md(converter, tmp_path, 'a,b,c\n1,2,3\n4,5\n')
+    assert md == '| a | b | c |\n| --- | --- | --- |\n| 1 | 2 | 3 |\n| 4 | 5 |  |\n'
+
+
+def test_csv_multichar_delimiter(converter, tmp_path):
+    md = _csv_to_md(converter, tmp_path, 'a::b\n1::2\n', delimiter='::')
+    assert md == '| a | b |\n| --- | --- |\n| 1 | 2 |\n'
+
+
+def test_csv_pyarrow_unsupported_error_falls_back(converter, tmp_path, monkeypatch):
+    def unsupported(*args, **kwargs):
+        raise NotImplementedError
+    monkeypatch.setattr(MarkdownExcelConverter, '_read_csv_pyarrow', unsupported)
+    md = _csv_to_md(converter, tmp_path, 'a,b\n1,2\n')
+    assert md == '| a | b |\n| --- | --- |\n| 1 | 2 |\n'